@@ -1,10 +1,11 @@
+import multiprocessing
 import os
+import secrets
 import shutil
 import subprocess
-import tempfile
-import time
-import uuid
+import sys
 import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from io import BytesIO
 from pathlib import Path
 
@@ -12,6 +13,11 @@ import click
 import mozjpeg_lossless_optimization
 from PIL import Image
 
+try:
+    import imagequant
+except ImportError:
+    imagequant = None
+
 
 class QualityInteger(click.ParamType):
     name = "QualityInteger"
@@ -58,8 +64,9 @@ def generate_output_path(fp, output=None):
     :return: The output path.
     :rtype: Path
     """
-    uuid_str = get_uuid("".join(["AGPicCompress", str(time.time()), fp.name]))
-    new_fp = Path(fp.parent, f"{fp.stem}_{uuid_str}_compressed{fp.suffix}")
+    # Only uniqueness matters here, a random token avoids hashing a name for every file
+    token = secrets.token_hex(8)
+    new_fp = Path(fp.parent, f"{fp.stem}_{token}_compressed{fp.suffix}")
 
     if output:
         if output.is_dir():
@@ -105,16 +112,18 @@ def optimize_output_path(fp, output=None, force=False):
     return new_fp
 
 
-def find_pngquant_cmd():
+def find_executable(name):
     """
-    Find and return the executable file path of pngquant.
+    Find and return the executable file path of a bundled command line tool.
 
-    :return: The executable file path of pngquant, or None if not found.
+    :param name: The name of the executable, without extension.
+    :type name: str
+    :return: The executable file path, or None if not found.
     :rtype: str or None
     """
-    pngquant_cmd = shutil.which('pngquant')
-    if pngquant_cmd:
-        return pngquant_cmd
+    cmd = shutil.which(name)
+    if cmd:
+        return cmd
     exe_extension = '.exe' if os.name == 'nt' else ''
     # 兼容 PyInstaller 打包后的路径
     if hasattr(sys, '_MEIPASS'):
@@ -122,22 +131,74 @@ def find_pngquant_cmd():
     else:
         search_paths = [Path(__file__).resolve().parent, Path(__file__).resolve().parent / 'ext']
     for search_path in search_paths:
-        pngquant_exe_path = search_path / f'pngquant{exe_extension}'
-        if pngquant_exe_path.exists():
-            return str(pngquant_exe_path)
+        exe_path = search_path / f'{name}{exe_extension}'
+        if exe_path.exists():
+            return str(exe_path)
     return None
 
 
-def get_uuid(name):
+# Executable paths of the external tools by name, filled on first lookup or handed to directory workers
+_tool_cmds = {}
+
+
+def find_pngquant_cmd():
+    """
+    Find and return the executable file path of pngquant.
+    The result is cached, so batch compression only searches for it once.
+
+    :return: The executable file path of pngquant, or None if not found.
+    :rtype: str or None
     """
-    Get the UUID string of the specified string.
+    if 'pngquant' not in _tool_cmds:
+        _tool_cmds['pngquant'] = find_executable('pngquant')
+    return _tool_cmds['pngquant']
 
-    :param name: The name string for UUID generation.
-    :type name: str
-    :return: The UUID string generated based on the specified name.
-    :rtype: str
+
+def find_cjpeg_cmd():
+    """
+    Find and return the executable file path of mozjpeg's cjpeg.
+    cjpeg is optional, JPEG images are encoded with PIL and mozjpeg_lossless_optimization without it.
+    The cjpeg of plain libjpeg or libjpeg-turbo is ignored, as it does not apply mozjpeg's trellis quantization.
+
+    :return: The executable file path of cjpeg, or None if not found.
+    :rtype: str or None
+    """
+    if 'cjpeg' not in _tool_cmds:
+        _tool_cmds['cjpeg'] = _find_mozjpeg_cjpeg()
+    return _tool_cmds['cjpeg']
+
+
+def _find_mozjpeg_cjpeg():
+    """
+    Find cjpeg and check that it is mozjpeg's, uncached.
+
+    :return: The executable file path of cjpeg, or None if not found.
+    :rtype: str or None
+    """
+    cjpeg_cmd = find_executable('cjpeg')
+    if not cjpeg_cmd:
+        return None
+    try:
+        result = subprocess.run([cjpeg_cmd, '-version'], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+    except OSError:
+        return None
+    return cjpeg_cmd if b'mozjpeg' in result.stdout.lower() else None
+
+
+def _compress_in_worker(tool_cmds, *args):
+    """
+    Compress one file of a directory in a worker process.
+
+    Workers started by spawn, the default on Windows and macOS, do not inherit the parent's cached lookups, so
+    the tools resolved once by the parent are passed in and cached here before compressing.
+
+    :param tool_cmds: Executable paths of the external tools by name, as resolved by the parent.
+    :type tool_cmds: dict
+    :param args: Positional arguments of ImageCompressor.compress_image.
     """
-    return str(uuid.uuid3(uuid.NAMESPACE_DNS, name))
+    _tool_cmds.update(tool_cmds)
+    ImageCompressor.compress_image(*args)
 
 
 class ImageCompressor:
@@ -145,62 +206,24 @@ class ImageCompressor:
         pass
 
     @staticmethod
-    def _save_image(img, file_path, img_format=None, quality=None, existing_bytes=None):
+    def _save_image(file_path, image_bytes):
         """
-        Save image to file, avoiding secondary compression.
-        
-        If existing_bytes is provided, it will be written directly to the file without further compression.
-        Otherwise, it will use PIL's convert and BytesIO methods to get image bytes, then write to file.
-        
-        :param img: Image object. Can be None when existing_bytes is provided.
-        :type img: PIL.Image.Image or None
+        Save encoded image bytes to file, avoiding secondary compression.
+
         :param file_path: File path to save to.
         :type file_path: Path
-        :param img_format: Image format ('JPEG', 'PNG', 'WEBP', etc.), must be provided when existing_bytes is None.
-        :type img_format: str or None
-        :param quality: Compression quality, only used when new compression is necessary.
-        :type quality: int or None
-        :param existing_bytes: Existing image byte data, if provided will be written directly to file.
-        :type existing_bytes: bytes or None
+        :param image_bytes: The encoded image byte data, written as it is.
+        :type image_bytes: bytes
         :return: File path
         :rtype: Path
         """
-        if existing_bytes:
-            with open(file_path, 'wb') as f:
-                f.write(existing_bytes)
-            return file_path
-        
-        if not img:
-            raise ValueError("One of the img or existing_bytes parameters must be provided")
-        
-        if not img_format:
-            ext = file_path.suffix.lower()
-            if ext == '.jpg' or ext == '.jpeg':
-                img_format = 'JPEG'
-            elif ext == '.png':
-                img_format = 'PNG'
-            elif ext == '.webp':
-                img_format = 'WEBP'
-            else:
-                raise ValueError(f"Unknown file format: {ext}")
-        
-        # First converted to bytes, quality parameters must be specified to avoid using the default settings of PIL
-        with BytesIO() as buffer:
-            save_params = {'format': img_format}
-            if quality is not None:
-                save_params['quality'] = quality
-
-            img.save(buffer, **save_params)
-            img_bytes = buffer.getvalue()
-
-            with open(file_path, 'wb') as f:
-                f.write(img_bytes)
-        
+        with open(file_path, 'wb') as f:
+            f.write(image_bytes)
         return file_path
 
     @staticmethod
     def compress_image(fp, force=False, quality=None, output=None, webp=False, target_size=None, size_range=None,
-                       webp_quality=100):
+                       webp_quality=85, jobs=None):
         """
         Compression function.
 
@@ -218,8 +241,11 @@ class ImageCompressor:
         :type target_size: int or None
         :param size_range: A tuple of (min_size, max_size) in KB. Tries to keep quality while ensuring size is within range.
         :type size_range: tuple(int, int) or None
-        :param webp_quality: Quality for WebP conversion (1-100). Default is 100.
+        :param webp_quality: Quality for WebP conversion (1-100). Default is 85.
         :type webp_quality: int
+        :param jobs: Number of processes compressing the files of a directory in parallel. Defaults to the number of
+            CPUs, 1 compresses the files one by one.
+        :type jobs: int or None
         """
 
         # Parameter validation
@@ -240,6 +266,9 @@ class ImageCompressor:
                 raise ValueError(
                     f"Minimum size must be less than maximum size, got min_size={min_size}, max_size={max_size}")
 
+        if jobs is not None and jobs < 1:
+            raise ValueError(f"Jobs must be at least 1, got {jobs}")
+
         # Check if the file exists
         if not fp.exists():
             raise FileNotFoundError(f'"{fp}": Path or directory does not exist')
@@ -256,10 +285,24 @@ class ImageCompressor:
                     raise ValueError('Inconsistent output file format with input file format')
 
         if fp.is_dir():
-            for file in fp.iterdir():
-                if file.is_file() and file.suffix.lower() in ['.png', '.jpg', '.jpeg']:
+            # List the files up front so outputs written into the same directory are not picked up
+            files = [file for file in fp.iterdir() if file.is_file() and file.suffix.lower() in ['.png', '.jpg', '.jpeg']]
+            max_workers = min(len(files), jobs or os.cpu_count() or 1)
+            if max_workers > 1:
+                # Resolve the external tools once here and hand them to the workers, so none of them searches for
+                # them (and runs cjpeg -version) again
+                tool_cmds = {'pngquant': find_pngquant_cmd(), 'cjpeg': find_cjpeg_cmd()}
+                # pngquant, mozjpeg and the PIL codecs do the heavy lifting, so each file gets its own process.
+                # The workers are reused for every file, so interpreter startup is paid once per worker
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    futures = [executor.submit(_compress_in_worker, tool_cmds, file, force, quality, output, webp,
+                                               target_size, size_range, webp_quality, 1) for file in files]
+                    for future in as_completed(futures):
+                        future.result()
+            else:
+                for file in files:
                     ImageCompressor.compress_image(file, force, quality, output, webp, target_size, size_range,
-                                                   webp_quality)
+                                                   webp_quality, 1)
             return
 
         ext = fp.suffix.lower()
@@ -271,108 +314,456 @@ class ImageCompressor:
             raise ValueError(f'"{fp.name}": Unsupported output file format')
 
     @staticmethod
-    def _convert_to_webp(fp, target_size=None, size_range=None, webp_quality=100):
+    def _convert_to_webp_from_image(img, target_size=None, size_range=None, webp_quality=85):
         """
-        Convert an image to WebP format.
+        Convert a decoded image to WebP in memory.
 
-        :param fp: Image file path.
-        :type fp: Path
+        :param img: Image object.
+        :type img: PIL.Image.Image
         :param target_size: Target file size in KB to maintain after conversion.
         :type target_size: int or None
         :param size_range: A tuple of (min_size, max_size) in KB to maintain after conversion.
         :type size_range: tuple(int, int) or None
         :param webp_quality: Quality for WebP conversion (1-100).
         :type webp_quality: int
-        :return: WebP image file path.
-        :rtype: Path or None
+        :return: The WebP bytes, padded up to the minimum size.
+        :rtype: bytes
         """
-        # Check if the file exists
-        if Path(fp).exists():
-            img = Image.open(fp)
-            webp_fp = Path(fp).with_suffix('.webp')
-
-            quality = webp_quality
-            attempts = 0
-            small_change_count = 0
-            previous_size = float('inf')
-
-            while attempts < 10:
-                ImageCompressor._save_image(img, webp_fp, 'WEBP', quality)
-                current_size = webp_fp.stat().st_size / 1024
-
-                if target_size is not None:
-                    if current_size <= target_size:
-                        if current_size < target_size:
-                            ImageCompressor._adjust_file_size(webp_fp, target_size)
-                        break
-                elif size_range is not None:
-                    min_size, max_size = size_range
-                    if current_size <= max_size:
-                        if current_size < min_size:
-                            ImageCompressor._adjust_file_size(webp_fp, min_size)
-                        break
-                else:
-                    break
-
-                size_reduction = previous_size - current_size
-                if size_reduction < 5:
-                    small_change_count += 1
-                    if small_change_count >= 3:
-                        if target_size is not None:
-                            raise ValueError(
-                                f"Unable to compress WebP to target size of {target_size}KB. Best achieved: {current_size:.2f}KB")
-                        else:
-                            raise ValueError(
-                                f"Unable to compress WebP to size range of {min_size}-{max_size}KB. Best achieved: {current_size:.2f}KB")
-                else:
-                    small_change_count = 0
+        img = ImageCompressor._webp_mode_image(img)
+        if target_size is None and size_range is None:
+            return ImageCompressor._encode_webp_at(img, webp_quality)
 
-                previous_size = current_size
-                if current_size > (target_size if target_size else size_range[1]):
-                    quality = max(10, quality - 5)
-                else:
-                    quality = min(100, quality + 5)
+        return ImageCompressor._converge_to_size(
+            lambda q: ImageCompressor._encode_webp_at(img, q), target_size, size_range, quality=webp_quality,
+            kind='WebP')
+
+    @staticmethod
+    def _webp_mode_image(img):
+        """
+        Convert an image to a mode WebP supports, keeping alpha.
 
-                attempts += 1
+        Done once up front instead of letting PIL convert on every encode.
 
-            # Delete the original image file
-            os.remove(fp)
-            return webp_fp
-        return None
+        :param img: Image object.
+        :type img: PIL.Image.Image
+        :return: The image itself if its mode is RGB or RGBA, otherwise a converted copy.
+        :rtype: PIL.Image.Image
+        """
+        if img.mode in ("RGB", "RGBA"):
+            return img
+        return img.convert("RGBA" if img.mode in ("LA", "PA") or "transparency" in img.info else "RGB")
 
     @staticmethod
-    def _adjust_file_size(file_path, target_size_kb):
+    def _open_rgb(fp):
         """
-        Adjust file size to match the target size by adding bytes.
+        Open an image and load it in RGB mode.
 
-        :param file_path: Path to the file to adjust
-        :type file_path: Path
-        :param target_size_kb: Target size in KB
-        :type target_size_kb: int
-        :return: True if adjustment was successful, False otherwise
-        :rtype: bool
+        RGB sources, which covers most JPEG photos, are returned as they are instead of being copied by convert().
+
+        :param fp: Image file path.
+        :type fp: Path
+        :return: Loaded RGB image object, the caller is responsible for closing it.
+        :rtype: PIL.Image.Image
         """
-        target_size_bytes = target_size_kb * 1024
-        current_size_bytes = file_path.stat().st_size
+        img = Image.open(fp)
+        # Loading also closes the underlying file for single-frame images
+        img.load()
+        if img.mode != "RGB":
+            img_rgb = img.convert("RGB")
+            img.close()
+            return img_rgb
+        return img
 
-        if current_size_bytes >= target_size_bytes:
-            return True
+    @staticmethod
+    def _encode_jpeg_at(img_rgb, quality):
+        """
+        Encode an RGB image as JPEG at the given quality with mozjpeg.
 
-        bytes_to_add = target_size_bytes - current_size_bytes
+        Uses mozjpeg's cjpeg when available, otherwise encodes with PIL and losslessly optimizes the result.
 
-        with open(file_path, 'rb') as f:
-            content = f.read()
+        :param img_rgb: RGB image object.
+        :type img_rgb: PIL.Image.Image
+        :param quality: JPEG quality (1-100).
+        :type quality: int
+        :return: The optimized JPEG bytes.
+        :rtype: bytes
+        """
+        cjpeg_cmd = find_cjpeg_cmd()
+        if cjpeg_cmd:
+            # cjpeg encodes straight from the pixels, one mozjpeg encode instead of PIL's encode plus a lossless pass
+            with BytesIO() as buffer:
+                img_rgb.save(buffer, format="PPM")
+                ppm_bytes = buffer.getvalue()
+            result = subprocess.run([cjpeg_cmd, '-quality', f'{quality}', '-optimize', '-progressive'],
+                                    input=ppm_bytes, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            return result.stdout
+
+        # mozjpeg rewrites the entropy coding as progressive with optimized Huffman tables,
+        # so asking PIL for optimize/progressive here only costs encode time for identical output
+        with BytesIO() as buffer:
+            img_rgb.save(buffer, format="JPEG", quality=quality, optimize=False, progressive=False)
+            # optimize() only takes bytes (cffi rejects a memoryview), so getbuffer() cannot avoid this copy
+            input_jpeg_bytes = buffer.getvalue()
 
-        padding = b'\xff\xfe' + b'\x00' * (bytes_to_add - 2)
+        return mozjpeg_lossless_optimization.optimize(input_jpeg_bytes)
 
-        with open(file_path, 'wb') as f:
-            f.write(content + padding)
+    @staticmethod
+    def _converge_jpeg_to_size(img_rgb, target_size=None, size_range=None, quality=None):
+        """
+        Encode an image as JPEG at the highest quality that fits the target size or size range.
+
+        Without cjpeg, the attempts only use PIL's optimized Huffman coding, which comes within a few percent of
+        mozjpeg's size, and mozjpeg's lossless pass, by far the slowest step, runs once on the chosen attempt.
+
+        :param img_rgb: RGB image object.
+        :type img_rgb: PIL.Image.Image
+        :param target_size: Target file size in KB.
+        :type target_size: int or None
+        :param size_range: A tuple of (min_size, max_size) in KB, used when target_size is None.
+        :type size_range: tuple(int, int) or None
+        :param quality: Highest quality to try, tried first. None searches the whole range.
+        :type quality: int or None
+        :return: The optimized JPEG bytes, padded up to the minimum size.
+        :rtype: bytes
+        """
+        if find_cjpeg_cmd():
+            return ImageCompressor._converge_to_size(
+                lambda q: ImageCompressor._encode_jpeg_at(img_rgb, q), target_size, size_range, quality=quality)
+
+        def encode_attempt(quality):
+            # optimize=False would save a few ms but overestimates the final size by up to 5%, costing quality
+            with BytesIO() as buffer:
+                img_rgb.save(buffer, format="JPEG", quality=quality, optimize=True)
+                return buffer.getvalue()
+
+        def optimize_chosen(best_bytes):
+            # The pass is lossless and only shrinks the data, so the result still fits
+            optimized_jpeg_bytes = mozjpeg_lossless_optimization.optimize(best_bytes)
+            return optimized_jpeg_bytes if len(optimized_jpeg_bytes) <= len(best_bytes) else best_bytes
+
+        return ImageCompressor._converge_to_size(encode_attempt, target_size, size_range, quality=quality,
+                                                 finish_fn=optimize_chosen)
+
+    @staticmethod
+    def _webp_save_params(quality=None):
+        """
+        Get the PIL save parameters for lossy WebP encoding.
+
+        libwebp's effort level 4 keeps every encode attempt fast, higher levels cost much more time for little size.
+
+        :param quality: WebP quality (1-100), PIL's default is used when None.
+        :type quality: int or None
+        :return: Keyword arguments for PIL.Image.Image.save.
+        :rtype: dict
+        """
+        save_params = {'method': 4, 'lossless': False}
+        if quality is not None:
+            save_params['quality'] = quality
+        return save_params
+
+    @staticmethod
+    def _encode_webp_at(img, quality):
+        """
+        Encode an image as WebP at the given quality.
+
+        :param img: Image object.
+        :type img: PIL.Image.Image
+        :param quality: WebP quality (1-100).
+        :type quality: int
+        :return: The WebP bytes.
+        :rtype: bytes
+        """
+        with BytesIO() as buffer:
+            img.save(buffer, format="WEBP", **ImageCompressor._webp_save_params(quality))
+            return buffer.getvalue()
+
+    @staticmethod
+    def _run_pngquant(pngquant_cmd, fp, new_fp=None, quality=None):
+        """
+        Run pngquant on a PNG image without going through a shell.
+
+        :param pngquant_cmd: The executable file path of pngquant.
+        :type pngquant_cmd: str
+        :param fp: Path of the source PNG file, or the PNG bytes, which are piped through stdin.
+        :type fp: Path or bytes
+        :param new_fp: Path pngquant writes the quantized image to. If None, the image is read from stdout instead.
+        :type new_fp: Path or None
+        :param quality: Compression quality. 80-90, or 90. Defaults to None.
+        :type quality: int or tuple[int, int] or None
+        :return: The quantized PNG bytes when new_fp is None, otherwise None.
+        :rtype: bytes or None
+        """
+        # pngquant's default speed is kept for search attempts as well, '--speed 10' is about 4x faster but its
+        # output is 15-35% larger, so it cannot stand in for the final encode when comparing sizes
+        piped = isinstance(fp, bytes)
+        command = [pngquant_cmd, '-' if piped else str(fp), '--skip-if-larger', '-f', '-o',
+                   str(new_fp) if new_fp is not None else '-']
+        if isinstance(quality, int):
+            command.extend(['--quality', f'{quality}'])
+        elif isinstance(quality, tuple):
+            command.extend(['--quality', f'{quality[0]}-{quality[1]}'])
+        stdin_args = {'input': fp} if piped else {'stdin': subprocess.DEVNULL}
+        result = subprocess.run(command, stdout=subprocess.DEVNULL if new_fp is not None else subprocess.PIPE,
+                                stderr=subprocess.PIPE, check=True, **stdin_args)
+        return result.stdout
+
+    @staticmethod
+    def _quantize_png_at(pngquant_cmd, fp, quality):
+        """
+        Quantize a PNG image with pngquant at the given quality, keeping the result in memory.
 
-        return True
+        :param pngquant_cmd: The executable file path of pngquant.
+        :type pngquant_cmd: str
+        :param fp: Path of the source PNG file, or the PNG bytes.
+        :type fp: Path or bytes
+        :param quality: pngquant quality (1-100).
+        :type quality: int
+        :return: The quantized PNG bytes, or None if nothing was generated.
+        :rtype: bytes or None
+        """
+        # pngquant reads a bare '--quality N' as a minimum of 0.9 * N and gives up below it, the search only wants
+        # N as the target. It still exits with 98 when the result is larger than the source
+        try:
+            return ImageCompressor._run_pngquant(pngquant_cmd, fp, quality=(0, quality)) or None
+        except subprocess.CalledProcessError as e:
+            if e.returncode in (98, 99):
+                return None
+            raise
+
+    @staticmethod
+    def _quantize_png_in_process(img_rgba, quality):
+        """
+        Quantize an image with the libimagequant binding at the given quality, keeping the result in memory.
+
+        The binding's libimagequant remaps without pngquant 3's dither map, so at the same quality its output is
+        around 20% larger than pngquant's. It is only a fallback for when pngquant is not found.
+
+        :param img_rgba: RGBA image object, decoded once and reused across attempts.
+        :type img_rgba: PIL.Image.Image
+        :param quality: Target quality (1-100).
+        :type quality: int
+        :return: The quantized PNG bytes.
+        :rtype: bytes
+        """
+        quantized_img = imagequant.quantize_pil_image(img_rgba, max_quality=quality)
+        with BytesIO() as buffer:
+            quantized_img.save(buffer, format="PNG", optimize=True)
+            return buffer.getvalue()
+
+    @staticmethod
+    def _png_quantize_fn(pngquant_cmd, fp, img=None):
+        """
+        Get the function quantizing a PNG image at a quality, for the size searches.
+
+        Each attempt launches pngquant. Without pngquant, the libimagequant binding quantizes in process instead,
+        from an image decoded once.
+
+        :param pngquant_cmd: The executable file path of pngquant, or None to use the libimagequant binding.
+        :type pngquant_cmd: str or None
+        :param fp: Path of the source PNG file, or the PNG bytes.
+        :type fp: Path or bytes
+        :param img: The source image if it is already decoded, then the binding does not decode fp again.
+        :type img: PIL.Image.Image or None
+        :return: A function mapping a quality to the quantized PNG bytes, or None if nothing was generated.
+        :rtype: callable
+        """
+        if pngquant_cmd:
+            return lambda q: ImageCompressor._quantize_png_at(pngquant_cmd, fp, q)
+        if img is not None:
+            img_rgba = img.convert('RGBA')
+        else:
+            with Image.open(BytesIO(fp) if isinstance(fp, bytes) else fp) as img:
+                img_rgba = img.convert('RGBA')
+        return lambda q: ImageCompressor._quantize_png_in_process(img_rgba, q)
+
+    @staticmethod
+    def _size_predicate(min_size, max_size, tolerance=0.05):
+        """
+        Build a predicate classifying an encoded size against a size range.
+
+        :param min_size: Minimum size in KB.
+        :type min_size: int
+        :param max_size: Maximum size in KB.
+        :type max_size: int
+        :param tolerance: Fraction below max_size that is close enough to stop searching. Defaults to 0.05, a
+            higher quality would gain at most that much size.
+        :type tolerance: float
+        :return: A function mapping a size in bytes to 'too_big', 'close', 'ok' or 'too_small'.
+        :rtype: callable
+        """
+        min_size_bytes, max_size_bytes = min_size * 1024, max_size * 1024
+        close_size_bytes = max_size_bytes * (1 - tolerance)
+
+        def predicate(size_bytes):
+            if size_bytes > max_size_bytes:
+                return 'too_big'
+            if size_bytes >= close_size_bytes:
+                return 'close'
+            if size_bytes < min_size_bytes:
+                return 'too_small'
+            return 'ok'
+
+        return predicate
+
+    @staticmethod
+    def _binary_search_quality(encode_fn, predicate, q_lo=1, q_hi=100, q_start=None, aim_bytes=None):
+        """
+        Binary search for the highest quality whose encoded output is not too big.
+
+        Output sizes grow with quality, so this takes at most log2(q_hi - q_lo + 1) + 1 encodes, and stops early
+        once an attempt is 'close' to the maximum size. With aim_bytes, every other step tries the quality a
+        secant through the last two attempts predicts instead of the midpoint, at most doubling the bound above.
+
+        :param encode_fn: Function encoding the image at a quality and returning the bytes, or None if nothing was
+            generated, which counts as too big.
+        :type encode_fn: callable
+        :param predicate: Function classifying an encoded size in bytes as 'too_big', 'close', 'ok' or 'too_small'.
+        :type predicate: callable
+        :param q_lo: Lowest quality to try.
+        :type q_lo: int
+        :param q_hi: Highest quality to try.
+        :type q_hi: int
+        :param q_start: Quality to try first, defaults to the middle of the range.
+        :type q_start: int or None
+        :param aim_bytes: Size in bytes the secant steps aim at. Only bisects when None.
+        :type aim_bytes: float or None
+        :return: The chosen quality and its bytes. If no quality fits, the quality is None and the bytes are the
+            smallest attempt; both are None if encode_fn generated nothing at any quality.
+        :rtype: tuple[int or None, bytes or None]
+        """
+        best_quality, best_bytes = None, None
+        smallest_bytes = None
+        previous_attempt = None
+        predicted = False
+        lo, hi = q_lo, q_hi
+        mid = q_start if q_start is not None else (lo + hi) // 2
+        while lo <= hi:
+            encoded_bytes = encode_fn(mid)
+            if encoded_bytes is None:
+                # Nothing to measure, so there is no secant step either
+                hi, mid = mid - 1, (lo + mid - 1) // 2
+                previous_attempt = None
+                continue
+
+            size_bytes = len(encoded_bytes)
+            verdict = predicate(size_bytes)
+            if verdict == 'close':
+                return mid, encoded_bytes
+            if verdict == 'too_big':
+                smallest_bytes = encoded_bytes
+                hi = mid - 1
+            else:
+                best_quality, best_bytes = mid, encoded_bytes
+                lo = mid + 1
+
+            attempt, mid = (mid, size_bytes), (lo + hi) // 2
+            # Sizes grow roughly linearly with quality, so the secant usually lands closer than the midpoint.
+            # Alternating with bisection keeps the interval halving even when the prediction is poor.
+            if aim_bytes is not None and previous_attempt is not None and not predicted:
+                (q0, size0), (q1, size1) = previous_attempt, attempt
+                if size1 != size0:
+                    secant_q = q1 + round((aim_bytes - size1) * (q1 - q0) / (size1 - size0))
+                    if lo <= secant_q <= hi:
+                        mid = secant_q
+                        predicted = True
+            else:
+                predicted = False
+            previous_attempt = attempt
+
+        if best_quality is None:
+            return None, smallest_bytes
+        return best_quality, best_bytes
+
+    @staticmethod
+    def _converge_to_size(encode_fn, target_size=None, size_range=None, quality=None, kind='image',
+                          tolerance=0.05, finish_fn=None):
+        """
+        Search for the highest quality whose encoded output fits the target size or size range.
+
+        The result is padded up to the minimum size, so callers can write it as it is.
+
+        :param encode_fn: Function encoding the image at a quality and returning the bytes, or None if nothing was
+            generated.
+        :type encode_fn: callable
+        :param target_size: Target file size in KB.
+        :type target_size: int or None
+        :param size_range: A tuple of (min_size, max_size) in KB, used when target_size is None.
+        :type size_range: tuple(int, int) or None
+        :param quality: Highest quality to try, tried first. None searches the whole range.
+        :type quality: int or None
+        :param kind: What is being compressed, used in the error message.
+        :type kind: str
+        :param tolerance: Fraction below the maximum size that is close enough to stop searching, see
+            _size_predicate.
+        :type tolerance: float
+        :param finish_fn: Function applied once to the chosen bytes before padding, such as a lossless pass that
+            would be too slow for every attempt.
+        :type finish_fn: callable or None
+        :return: The encoded bytes, padded up to the minimum size, or None if encode_fn generated nothing.
+        :rtype: bytes or None
+        :raises ValueError: If no quality fits.
+        """
+        min_size, max_size = (target_size, target_size) if target_size is not None else size_range
+        q_hi, q_start = (quality, quality) if quality is not None else (100, None)
+        # The secant steps aim at the middle of the band the predicate reports as 'close'
+        best_quality, best_bytes = ImageCompressor._binary_search_quality(
+            encode_fn, ImageCompressor._size_predicate(min_size, max_size, tolerance), q_hi=q_hi, q_start=q_start,
+            aim_bytes=max_size * 1024 * (1 - tolerance / 2))
+
+        if best_bytes is None:
+            return None
+        if best_quality is None:
+            if target_size is not None:
+                raise ValueError(
+                    f"Unable to compress {kind} to target size of {target_size}KB. Best achieved: {len(best_bytes) / 1024:.2f}KB")
+            else:
+                raise ValueError(
+                    f"Unable to compress {kind} to size range of {min_size}-{max_size}KB. Best achieved: {len(best_bytes) / 1024:.2f}KB")
+        if finish_fn is not None:
+            best_bytes = finish_fn(best_bytes)
+        return ImageCompressor._pad_image_bytes(best_bytes, min_size)
+
+    @staticmethod
+    def _search_quality(quality, target_size=None):
+        """
+        Get the highest quality a size search tries, which it also tries first.
+
+        A target size ignores the requested quality. A size range keeps it as the upper bound, or 90 when it is
+        not a single value.
+
+        :param quality: The requested quality.
+        :type quality: int or tuple[int, int] or None
+        :param target_size: Target file size in KB.
+        :type target_size: int or None
+        :return: The highest quality to try, or None to search the whole range.
+        :rtype: int or None
+        """
+        if target_size is not None:
+            return None
+        return quality if isinstance(quality, int) else 90
+
+    @staticmethod
+    def _pad_image_bytes(image_bytes, target_size_kb):
+        """
+        Pad image bytes up to the target size in memory.
+
+        Image decoders ignore trailing bytes, so the padding goes after the end of the image data.
+
+        :param image_bytes: The image byte data.
+        :type image_bytes: bytes
+        :param target_size_kb: Target size in KB
+        :type target_size_kb: int
+        :return: The padded bytes, or the original bytes if they already reach the target size.
+        :rtype: bytes
+        """
+        target_size_bytes = target_size_kb * 1024
+        if len(image_bytes) >= target_size_bytes:
+            return image_bytes
+        return (image_bytes + b'\xff\xfe').ljust(target_size_bytes, b'\0')[:target_size_bytes]
 
     @staticmethod
     def _compress_png(fp, force=False, quality=None, output=None, webp=False, target_size=None, size_range=None,
-                      webp_quality=100):
+                      webp_quality=85):
         """
         Compress PNG images and specify compression quality.
 
@@ -390,124 +781,44 @@ class ImageCompressor:
         :type target_size: int or None
         :param size_range: A tuple of (min_size, max_size) in KB. Tries to keep quality while ensuring size is within range.
         :type size_range: tuple(int, int) or None
-        :param webp_quality: Quality for WebP conversion (1-100). Default is 100.
+        :param webp_quality: Quality for WebP conversion (1-100). Default is 85.
         :type webp_quality: int
         """
         new_fp = optimize_output_path(fp, output, force)
-        pngquant_cmd = find_pngquant_cmd()
-        if not pngquant_cmd:
-            raise FileNotFoundError(
-                'pngquant not found. Please ensure pngquant is installed or added to the environment variable')
-
-        adjusted_target_size = None
-        adjusted_size_range = None
 
-        if webp and (target_size is not None or size_range is not None):
+        if webp:
+            # The WebP search alone decides the final size, so quantizing a PNG first, let alone searching it
+            # against an estimated WebP ratio, is wasted work. The WebP is encoded from the source pixels instead
             with Image.open(fp) as img:
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    temp_orig = Path(temp_dir) / f'temp_orig{fp.suffix}'
-                    ImageCompressor._save_image(img, temp_orig, 'PNG')
-                    orig_size = temp_orig.stat().st_size
-
-                    temp_webp = Path(temp_dir) / 'temp.webp'
-                    ImageCompressor._save_image(img, temp_webp, 'WEBP', webp_quality)
-                    webp_size = temp_webp.stat().st_size
-
-                    ratio = webp_size / orig_size if orig_size > 0 else 0.7
-
-                    safety_factor = 1.1
-                    if target_size is not None:
-                        adjusted_target_size = int(target_size / ratio * safety_factor)
-                    if size_range is not None:
-                        min_size, max_size = size_range
-                        adjusted_size_range = (
-                            int(min_size / ratio * safety_factor), int(max_size / ratio * safety_factor))
-        else:
-            adjusted_target_size = target_size
-            adjusted_size_range = size_range
-
-        if adjusted_size_range is not None:
-            min_size, max_size = adjusted_size_range
-            if min_size > max_size:
-                raise ValueError(f"Minimum size ({min_size}KB) cannot be greater than maximum size ({max_size}KB)")
-
-            current_quality = quality if isinstance(quality, int) else 90
-            attempts = 0
-            small_change_count = 0
-            previous_size = float('inf')
-
-            while True:
-                quality_command = f'--quality {current_quality}'
-                command = f'{pngquant_cmd} {fp} --skip-if-larger -f -o {new_fp} {quality_command}'
-                subprocess.run(command, shell=True, check=True)
-
-                if not new_fp.exists():
-                    warnings.warn(
-                        f'"{fp}": The compressed image file was not generated successfully. It may no longer be compressible or no longer exist',
-                        Warning)
-                    return
-
-                current_size = new_fp.stat().st_size / 1024
-
-                if current_size <= max_size:
-                    if current_size < min_size:
-                        ImageCompressor._adjust_file_size(new_fp, min_size)
-                    break
-
-                size_reduction = previous_size - current_size
-                if size_reduction < 5:
-                    small_change_count += 1
-                    if small_change_count >= 3:
-                        raise ValueError(
-                            f"Unable to compress image to size range of {min_size}-{max_size}KB. Best achieved: {current_size:.2f}KB")
-                else:
-                    small_change_count = 0
-
-                previous_size = current_size
-                current_quality = max(1, current_quality - 5)
-                attempts += 1
-
-        elif adjusted_target_size is not None:
-            current_quality = 80
-            attempts = 0
-            small_change_count = 0
-            previous_size = float('inf')
-
-            while True:
-                quality_command = f'--quality {current_quality}'
-                command = f'{pngquant_cmd} {fp} --skip-if-larger -f -o {new_fp} {quality_command}'
-                subprocess.run(command, shell=True, check=True)
-
-                if not new_fp.exists():
-                    warnings.warn(
-                        f'"{fp}": The compressed image file was not generated successfully. It may no longer be compressible or no longer exist',
-                        Warning)
-                    return
+                webp_bytes = ImageCompressor._convert_to_webp_from_image(img, target_size, size_range, webp_quality)
+            ImageCompressor._save_image(new_fp.with_suffix('.webp'), webp_bytes)
+            if new_fp == fp:
+                # Forced output overwrites the source, and the WebP takes its place
+                fp.unlink()
+            return
 
-                current_size = new_fp.stat().st_size / 1024
+        searching = target_size is not None or size_range is not None
+        pngquant_cmd = find_pngquant_cmd()
+        # Without pngquant, the size search can still fall back to the libimagequant binding
+        if not pngquant_cmd and not (searching and imagequant is not None):
+            raise FileNotFoundError(
+                'pngquant not found. Please ensure pngquant is installed or added to the environment variable')
 
-                if current_size <= adjusted_target_size:
-                    ImageCompressor._adjust_file_size(new_fp, adjusted_target_size)
-                    break
+        if searching:
+            best_bytes = ImageCompressor._converge_to_size(
+                ImageCompressor._png_quantize_fn(pngquant_cmd, fp), target_size, size_range,
+                quality=ImageCompressor._search_quality(quality, target_size))
 
-                size_reduction = previous_size - current_size
-                if size_reduction < 5:
-                    small_change_count += 1
-                    if small_change_count >= 3:
-                        raise ValueError(
-                            f"Unable to compress image to target size of {adjusted_target_size}KB. Best achieved: {current_size:.2f}KB")
-                else:
-                    small_change_count = 0
+            if best_bytes is None:
+                warnings.warn(
+                    f'"{fp}": The compressed image file was not generated successfully. It may no longer be compressible or no longer exist',
+                    Warning)
+                return
 
-                previous_size = current_size
-                current_quality = max(1, current_quality - 10)
-                attempts += 1
+            # Attempts stay in memory, only the chosen result is written to disk
+            ImageCompressor._save_image(new_fp, best_bytes)
         else:
-            quality_command = f'--quality {quality}' if isinstance(quality,
-                                                                   int) else f'--quality {quality[0]}-{quality[1]}' if isinstance(
-                quality, tuple) else ''
-            command = f'{pngquant_cmd} {fp} --skip-if-larger -f -o {new_fp} {quality_command}'
-            subprocess.run(command, shell=True, check=True)
+            ImageCompressor._run_pngquant(pngquant_cmd, fp, new_fp, quality)
 
             if not new_fp.exists():
                 warnings.warn(
@@ -515,12 +826,9 @@ class ImageCompressor:
                     Warning)
                 return
 
-        if webp:
-            ImageCompressor._convert_to_webp(new_fp, target_size, size_range, webp_quality)
-
     @staticmethod
     def _compress_jpg(fp, force=False, quality=None, output=None, webp=False, target_size=None, size_range=None,
-                      webp_quality=100):
+                      webp_quality=85):
         """
         Compress JPG images and specify compression quality.
 
@@ -538,132 +846,59 @@ class ImageCompressor:
         :type target_size: int or None
         :param size_range: A tuple of (min_size, max_size) in KB. Tries to keep quality while ensuring size is within range.
         :type size_range: tuple(int, int) or None
-        :param webp_quality: Quality for WebP conversion (1-100). Default is 100.
+        :param webp_quality: Quality for WebP conversion (1-100). Default is 85.
         :type webp_quality: int
         """
         new_fp = optimize_output_path(fp, output, force)
 
-        # First compress the JPEG to target size or size range
-        if size_range is not None:
-            min_size, max_size = size_range
-            if min_size > max_size:
-                raise ValueError(f"Minimum size ({min_size}KB) cannot be greater than maximum size ({max_size}KB)")
-
-            current_quality = quality if isinstance(quality, int) else 90
-            attempts = 0
-            small_change_count = 0
-            previous_size = float('inf')
-
-            while True:
-                with Image.open(fp) as img:
-                    img = img.convert("RGB")
-                    with BytesIO() as buffer:
-                        img.save(buffer, format="JPEG", quality=current_quality)
-                        input_jpeg_bytes = buffer.getvalue()
-
-                optimized_jpeg_bytes = mozjpeg_lossless_optimization.optimize(input_jpeg_bytes)
-                ImageCompressor._save_image(None, new_fp, existing_bytes=optimized_jpeg_bytes)
-
-                if not new_fp.exists():
-                    warnings.warn(
-                        f'"{fp}": The compressed image file was not generated successfully. It may no longer be compressible or no longer exist',
-                        Warning)
-                    return
-
-                current_size = new_fp.stat().st_size / 1024
-
-                if current_size <= max_size:
-                    if current_size < min_size:
-                        ImageCompressor._adjust_file_size(new_fp, min_size)
-                    break
-
-                size_reduction = previous_size - current_size
-                if size_reduction < 5:
-                    small_change_count += 1
-                    if small_change_count >= 3:
-                        raise ValueError(
-                            f"Unable to compress image to size range of {min_size}-{max_size}KB. Best achieved: {current_size:.2f}KB")
-                else:
-                    small_change_count = 0
-
-                previous_size = current_size
-                current_quality = max(1, current_quality - 5)
-                attempts += 1
-
-        elif target_size is not None:
-            current_quality = 80
-            attempts = 0
-            small_change_count = 0
-            previous_size = float('inf')
-
-            while True:
-                with Image.open(fp) as img:
-                    img = img.convert("RGB")
-                    with BytesIO() as buffer:
-                        img.save(buffer, format="JPEG", quality=current_quality)
-                        input_jpeg_bytes = buffer.getvalue()
-
-                optimized_jpeg_bytes = mozjpeg_lossless_optimization.optimize(input_jpeg_bytes)
-                ImageCompressor._save_image(None, new_fp, existing_bytes=optimized_jpeg_bytes)
-
-                if not new_fp.exists():
-                    warnings.warn(
-                        f'"{fp}": The compressed image file was not generated successfully. It may no longer be compressible or no longer exist',
-                        Warning)
-                    return
-
-                current_size = new_fp.stat().st_size / 1024
+        if webp:
+            # The JPEG would only be decoded again for the conversion, so the WebP is encoded from the source pixels
+            img_rgb = ImageCompressor._open_rgb(fp)
+            try:
+                webp_bytes = ImageCompressor._convert_to_webp_from_image(img_rgb, target_size, size_range,
+                                                                         webp_quality)
+            finally:
+                img_rgb.close()
+            ImageCompressor._save_image(new_fp.with_suffix('.webp'), webp_bytes)
+            if new_fp == fp:
+                # Forced output overwrites the source, and the WebP takes its place
+                fp.unlink()
+            return
 
-                if current_size <= target_size:
-                    ImageCompressor._adjust_file_size(new_fp, target_size)
-                    break
+        # First compress the JPEG to target size or size range
+        if size_range is not None or target_size is not None:
+            # Decode once, the pixels do not change between attempts
+            img_rgb = ImageCompressor._open_rgb(fp)
+            try:
+                best_bytes = ImageCompressor._converge_jpeg_to_size(
+                    img_rgb, target_size, size_range, ImageCompressor._search_quality(quality, target_size))
+            finally:
+                img_rgb.close()
 
-                size_reduction = previous_size - current_size
-                if size_reduction < 5:
-                    small_change_count += 1
-                    if small_change_count >= 3:
-                        raise ValueError(
-                            f"Unable to compress image to target size of {target_size}KB. Best achieved: {current_size:.2f}KB")
-                else:
-                    small_change_count = 0
+            ImageCompressor._save_image(new_fp, best_bytes)
 
-                previous_size = current_size
-                current_quality = max(1, current_quality - 10)
-                attempts += 1
         else:
             if quality is not None and not isinstance(quality, int):
                 raise ValueError(f'"{quality}": Unsupported type for quality parameter')
 
-            with Image.open(fp) as img:
-                img = img.convert("RGB")
-                with BytesIO() as buffer:
-                    img.save(buffer, format="JPEG", quality=quality if quality else 75)
-                    input_jpeg_bytes = buffer.getvalue()
-
-            optimized_jpeg_bytes = mozjpeg_lossless_optimization.optimize(input_jpeg_bytes)
-            ImageCompressor._save_image(None, new_fp, existing_bytes=optimized_jpeg_bytes)
-
-            if not new_fp.exists():
-                warnings.warn(
-                    f'"{fp}": The compressed image file was not generated successfully. It may no longer be compressible or no longer exist',
-                    Warning)
-                return
+            img_rgb = ImageCompressor._open_rgb(fp)
 
-        # If WebP conversion is requested, convert the compressed JPEG to WebP
-        if webp:
-            # Pass the original target_size and size_range to WebP conversion
-            ImageCompressor._convert_to_webp(new_fp, target_size, size_range, webp_quality)
+            optimized_jpeg_bytes = ImageCompressor._encode_jpeg_at(img_rgb, quality if quality else 75)
+            img_rgb.close()
+            ImageCompressor._save_image(new_fp, optimized_jpeg_bytes)
 
     @staticmethod
     def compress_image_from_bytes(image_bytes, quality=80, output_format='JPEG', webp=False, target_size=None,
-                                  size_range=None, webp_quality=100):
+                                  size_range=None, webp_quality=85):
         """
         Compresses image data and returns the compressed image data.
 
         :param image_bytes: The byte representation of the image data.
         :type image_bytes: bytes
-        :param quality: The compression quality, ranging from 1 to 100.
-        :type quality: int
+        :param quality: The compression quality, ranging from 1 to 100. None keeps the quality of JPEG data and
+            only optimizes it losslessly when no size limit or WebP conversion is requested. PNG also takes a
+            pngquant range such as (60, 80).
+        :type quality: int or tuple[int, int] or None
         :param output_format: The output format of the image, default is 'JPEG'.
         :type output_format: str
         :param webp: Whether to convert to WebP format.
@@ -672,7 +907,7 @@ class ImageCompressor:
         :type target_size: int or None
         :param size_range: A tuple of (min_size, max_size) in KB. Tries to keep quality while ensuring size is within range.
         :type size_range: tuple(int, int) or None
-        :param webp_quality: Quality for WebP conversion (1-100). Default is 100.
+        :param webp_quality: Quality for WebP conversion (1-100). Default is 85.
         :type webp_quality: int
         :return: The byte representation of the compressed image data.
         :rtype: bytes
@@ -696,322 +931,50 @@ class ImageCompressor:
                 raise ValueError(
                     f"Minimum size must be less than maximum size, got min_size={min_size}, max_size={max_size}")
 
-        with BytesIO(image_bytes) as img_buffer:
-            img = Image.open(img_buffer).convert('RGB')
-
-            if size_range is not None and target_size is not None:
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    temp_file_path = Path(
-                        temp_dir) / f'temp_{get_uuid(f"AGPicCompress{time.time()}")}.{output_format.lower()}'
-                    ImageCompressor._save_image(img, temp_file_path, output_format.upper(), quality)
-
-                    if output_format.upper() == 'JPEG':
-                        if size_range is not None:
-                            ImageCompressor._compress_jpg(temp_file_path, force=True, quality=quality,
-                                                          size_range=size_range, webp=webp, target_size=None,
-                                                          webp_quality=webp_quality)
-                        else:
-                            ImageCompressor._compress_jpg(temp_file_path, force=True, target_size=target_size,
-                                                          webp=webp, quality=None, webp_quality=webp_quality)
-                    elif output_format.upper() == 'PNG':
-                        if size_range is not None:
-                            ImageCompressor._compress_png(temp_file_path, force=True, quality=quality,
-                                                          size_range=size_range, webp=webp, target_size=None,
-                                                          webp_quality=webp_quality)
-                        else:
-                            ImageCompressor._compress_png(temp_file_path, force=True, target_size=target_size,
-                                                          webp=webp, quality=None, webp_quality=webp_quality)
-                    else:
-                        raise ValueError(f'"{output_format}": Unsupported output file format')
-
-                    final_path = temp_file_path.with_suffix('.webp') if webp else temp_file_path
-
-                    if final_path.exists():
-                        with open(final_path, 'rb') as compressed_file:
-                            compressed_img_bytes = compressed_file.read()
-                            return compressed_img_bytes
-                    else:
-                        raise ValueError(f"Failed to generate compressed image: {final_path}")
+        if quality is None:
+            # JPEG data only needs repacking, mozjpeg optimizes the compressed data without decoding it
+            if (output_format.upper() == 'JPEG' and target_size is None and size_range is None and not webp
+                    and image_bytes[:3] == b'\xff\xd8\xff'):
+                return mozjpeg_lossless_optimization.optimize(image_bytes)
+            quality = 80
+
+        # Decoded once here, every branch below works from this image
+        with BytesIO(image_bytes) as img_buffer, Image.open(img_buffer) as img:
+            if webp:
+                if output_format.upper() not in ('JPEG', 'PNG'):
+                    raise ValueError(f'"{output_format}": Unsupported output file format')
+                # The result is WebP either way, so it is encoded straight from the source image instead of
+                # compressing a JPEG or PNG first and converting that
+                return ImageCompressor._convert_to_webp_from_image(img, target_size, size_range, webp_quality)
 
             if output_format.upper() == 'JPEG':
-                with BytesIO() as output_buffer:
-                    ImageCompressor._save_image(img, Path('temp.jpg'), 'JPEG', quality)
-                    with open(Path('temp.jpg'), 'rb') as temp_file:
-                        compressed_img_bytes = temp_file.read()
-                    os.remove(Path('temp.jpg'))
-                    
-                    compressed_img_bytes = mozjpeg_lossless_optimization.optimize(compressed_img_bytes)
-
-                    if target_size is not None:
-                        with tempfile.TemporaryDirectory() as size_adjust_dir:
-                            temp_file_path = Path(size_adjust_dir) / f'temp_{get_uuid(f"AGPicCompress{time.time()}")}.jpg'
-                            ImageCompressor._save_image(None, temp_file_path, existing_bytes=compressed_img_bytes)
-
-                            current_size = temp_file_path.stat().st_size / 1024
-
-                            if current_size > target_size:
-                                current_quality = quality
-                                attempts = 0
-                                small_change_count = 0
-                                previous_size = float('inf')
-
-                                while current_size > target_size and attempts < 10:
-                                    current_quality = max(1, current_quality - 10)
-
-                                    with Image.open(temp_file_path) as img:
-                                        img = img.convert("RGB")
-                                        with BytesIO() as buffer:
-                                            img.save(buffer, format="JPEG", quality=current_quality)
-                                            input_jpeg_bytes = buffer.getvalue()
-
-                                    optimized_jpeg_bytes = mozjpeg_lossless_optimization.optimize(input_jpeg_bytes)
-                                    ImageCompressor._save_image(None, temp_file_path, existing_bytes=optimized_jpeg_bytes)
-
-                                    current_size = temp_file_path.stat().st_size / 1024
-
-                                    size_reduction = previous_size - current_size
-                                    if size_reduction < 5:
-                                        small_change_count += 1
-                                        if small_change_count >= 3:
-                                            raise ValueError(
-                                                f"Unable to compress image to target size of {target_size}KB. Best achieved: {current_size:.2f}KB")
-                                    else:
-                                        small_change_count = 0
-
-                                    previous_size = current_size
-                                    attempts += 1
-
-                            if current_size < target_size:
-                                ImageCompressor._adjust_file_size(temp_file_path, target_size)
-                                with open(temp_file_path, 'rb') as adjusted_file:
-                                    compressed_img_bytes = adjusted_file.read()
-                            # Ensure the temporary file is read back if it was used for size adjustment
-                            elif temp_file_path.exists(): # Check if temp_file_path was actually used and exists
-                                with open(temp_file_path, 'rb') as adjusted_file:
-                                    compressed_img_bytes = adjusted_file.read()
-
-                    elif size_range is not None:
-                        min_size, max_size = size_range
-                        with tempfile.TemporaryDirectory() as size_adjust_dir:
-                            temp_file_path = Path(size_adjust_dir) / f'temp_{get_uuid(f"AGPicCompress{time.time()}")}.jpg'
-                            ImageCompressor._save_image(None, temp_file_path, existing_bytes=compressed_img_bytes)
-
-                            current_size = temp_file_path.stat().st_size / 1024
-
-                            if current_size > max_size:
-                                current_quality = quality
-                                attempts = 0
-                                small_change_count = 0
-                                previous_size = float('inf')
-
-                                while current_size > max_size and attempts < 10:
-                                    current_quality = max(1, current_quality - 10)
-
-                                    with Image.open(temp_file_path) as img:
-                                        img = img.convert("RGB")
-                                        with BytesIO() as buffer:
-                                            img.save(buffer, format="JPEG", quality=current_quality)
-                                            input_jpeg_bytes = buffer.getvalue()
-
-                                    optimized_jpeg_bytes = mozjpeg_lossless_optimization.optimize(input_jpeg_bytes)
-                                    ImageCompressor._save_image(None, temp_file_path, existing_bytes=optimized_jpeg_bytes)
-
-                                    current_size = temp_file_path.stat().st_size / 1024
-
-                                    size_reduction = previous_size - current_size
-                                    if size_reduction < 5:
-                                        small_change_count += 1
-                                        if small_change_count >= 3:
-                                            raise ValueError(
-                                                f"Unable to compress image to size range of {min_size}-{max_size}KB. Best achieved: {current_size:.2f}KB")
-                                    else:
-                                        small_change_count = 0
-
-                                    previous_size = current_size
-                                    attempts += 1
-
-                            if current_size < min_size:
-                                ImageCompressor._adjust_file_size(temp_file_path, min_size)
-                                with open(temp_file_path, 'rb') as adjusted_file:
-                                    compressed_img_bytes = adjusted_file.read()
-                            # Ensure the temporary file is read back if it was used for size adjustment
-                            elif temp_file_path.exists(): # Check if temp_file_path was actually used and exists
-                                with open(temp_file_path, 'rb') as adjusted_file:
-                                    compressed_img_bytes = adjusted_file.read()
-                    
-                    # Add WebP conversion here if webp is True
-                    if webp:
-                        with tempfile.TemporaryDirectory() as temp_dir:
-                            temp_jpg_path = Path(temp_dir) / f'temp_input_for_webp_{get_uuid(str(time.time()))}.jpg'
-                            with open(temp_jpg_path, 'wb') as f_temp_jpg:
-                                f_temp_jpg.write(compressed_img_bytes)
-                            
-                            # Call _convert_to_webp with original target_size and size_range
-                            webp_converted_path = ImageCompressor._convert_to_webp(
-                                temp_jpg_path, 
-                                target_size,  # Pass original target_size
-                                size_range,   # Pass original size_range
-                                webp_quality
-                            )
-                            
-                            if webp_converted_path and webp_converted_path.exists():
-                                with open(webp_converted_path, 'rb') as f_webp:
-                                    compressed_img_bytes = f_webp.read()
-                                # _convert_to_webp might have deleted temp_jpg_path, so no explicit deletion here for it
-                            else:
-                                warnings.warn(
-                                    f"Failed to convert JPEG to WebP. Original JPEG bytes will be returned.",
-                                    Warning
-                                )
-                                # compressed_img_bytes remains the JPEG bytes
+                img_rgb = img if img.mode == 'RGB' else img.convert('RGB')
+                # Encoded in memory, no temporary file is written for the JPEG itself
+                if target_size is None and size_range is None:
+                    compressed_img_bytes = ImageCompressor._encode_jpeg_at(img_rgb, quality)
+                else:
+                    compressed_img_bytes = ImageCompressor._converge_jpeg_to_size(
+                        img_rgb, target_size, size_range, quality=quality)
 
             elif output_format.upper() == 'PNG':
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    temp_png_file_path = Path(temp_dir) / f'temp_{get_uuid(f"AGPicCompress{time.time()}")}.png'
-
-                    ImageCompressor._save_image(None, temp_png_file_path, existing_bytes=image_bytes)
-                    
-                    new_fp = optimize_output_path(temp_png_file_path, Path(temp_dir), False)
-                    pngquant_cmd = find_pngquant_cmd()
-                    if not pngquant_cmd:
-                        raise FileNotFoundError(
-                            'pngquant not found. Please ensure pngquant is installed or added to the environment variable')
-                    quality_command = f'--quality {quality}' if isinstance(quality,
-                                                                           int) else f'--quality {quality[0]}-{quality[1]}' if isinstance(
-                        quality, tuple) else ''
-                    command = f'{pngquant_cmd} {temp_png_file_path} --skip-if-larger -f -o {new_fp} {quality_command}'
-                    subprocess.run(command, shell=True, check=True)
-                    if new_fp.exists():
-                        with open(new_fp, 'rb') as compressed_img_file:
-                            compressed_img_bytes = compressed_img_file.read()
-
-                            if target_size is not None:
-                                with tempfile.TemporaryDirectory() as size_adjust_dir:
-                                    temp_file_path = Path(
-                                        size_adjust_dir) / f'temp_{get_uuid(f"AGPicCompress{time.time()}")}.png'
-                                    ImageCompressor._save_image(None, temp_file_path, existing_bytes=compressed_img_bytes)
-
-                                    current_size = temp_file_path.stat().st_size / 1024
-
-                                    if current_size > target_size:
-                                        current_quality = quality
-                                        attempts = 0
-                                        small_change_count = 0
-                                        previous_size = float('inf')
-
-                                        while current_size > target_size and attempts < 10:
-                                            current_quality = max(1, current_quality - 10)
-
-                                            quality_command = f'--quality {current_quality}'
-                                            command = f'{pngquant_cmd} {temp_file_path} --skip-if-larger -f -o {temp_file_path} {quality_command}'
-                                            subprocess.run(command, shell=True, check=True)
-
-                                            if not temp_file_path.exists():
-                                                break
-
-                                            current_size = temp_file_path.stat().st_size / 1024
-
-                                            size_reduction = previous_size - current_size
-                                            if size_reduction < 5:
-                                                small_change_count += 1
-                                                if small_change_count >= 3:
-                                                    raise ValueError(
-                                                        f"Unable to compress image to target size of {target_size}KB. Best achieved: {current_size:.2f}KB")
-                                            else:
-                                                small_change_count = 0
-
-                                            previous_size = current_size
-                                            attempts += 1
-
-                                    if current_size < target_size:
-                                        ImageCompressor._adjust_file_size(temp_file_path, target_size)
-                                        with open(temp_file_path, 'rb') as adjusted_file:
-                                            compressed_img_bytes = adjusted_file.read()
-
-                            elif size_range is not None:
-                                min_size, max_size = size_range
-                                with tempfile.TemporaryDirectory() as size_adjust_dir:
-                                    temp_file_path = Path(
-                                        size_adjust_dir) / f'temp_{get_uuid(f"AGPicCompress{time.time()}")}.png'
-
-                                    ImageCompressor._save_image(None, temp_file_path, existing_bytes=compressed_img_bytes)
-
-                                    current_size = temp_file_path.stat().st_size / 1024
-
-                                    if current_size > max_size:
-                                        current_quality = quality
-                                        attempts = 0
-                                        small_change_count = 0
-                                        previous_size = float('inf')
-
-                                        while current_size > max_size and attempts < 10:
-                                            current_quality = max(1, current_quality - 10)
-
-                                            quality_command = f'--quality {current_quality}'
-                                            command = f'{pngquant_cmd} {temp_file_path} --skip-if-larger -f -o {temp_file_path} {quality_command}'
-                                            subprocess.run(command, shell=True, check=True)
-
-                                            if not temp_file_path.exists():
-                                                break
-
-                                            current_size = temp_file_path.stat().st_size / 1024
-
-                                            size_reduction = previous_size - current_size
-                                            if size_reduction < 5:
-                                                small_change_count += 1
-                                                if small_change_count >= 3:
-                                                    raise ValueError(
-                                                        f"Unable to compress image to size range of {min_size}-{max_size}KB. Best achieved: {current_size:.2f}KB")
-                                            else:
-                                                small_change_count = 0
-
-                                            previous_size = current_size
-                                            attempts += 1
-
-                                    if current_size < min_size:
-                                        ImageCompressor._adjust_file_size(temp_file_path, min_size)
-                                        with open(temp_file_path, 'rb') as adjusted_file:
-                                            compressed_img_bytes = adjusted_file.read()
-                    else:
-                        warnings.warn(
-                            'The compressed image file was not generated successfully. It may no longer be compressible or no longer exist',
-                            Warning)
-                        return None
-
-                    if webp:
-                        with tempfile.TemporaryDirectory() as webp_temp_dir:
-                            temp_img_path = Path(webp_temp_dir) / f'temp_{get_uuid(f"AGPicCompress{time.time()}")}.png'
-
-                            ImageCompressor._save_image(None, temp_img_path, existing_bytes=compressed_img_bytes)
-
-                            webp_path = ImageCompressor._convert_to_webp(temp_img_path, target_size, size_range,
-                                                                         webp_quality)
-
-                            if webp_path and webp_path.exists():
-                                with open(webp_path, 'rb') as webp_file:
-                                    compressed_img_bytes = webp_file.read()
-                            else:
-                                with tempfile.TemporaryDirectory() as webp_out_dir:
-                                    temp_webp_path = Path(webp_out_dir) / 'temp.webp'
-                                    img = Image.open(BytesIO(compressed_img_bytes))
-                                    ImageCompressor._save_image(img, temp_webp_path, 'WEBP', webp_quality)
-                                    with open(temp_webp_path, 'rb') as webp_file:
-                                        compressed_img_bytes = webp_file.read()
-
-                                if size_range is not None:
-                                    min_size, max_size = size_range
-                                    with tempfile.TemporaryDirectory() as size_adjust_dir:
-                                        temp_file_path = Path(
-                                            size_adjust_dir) / f'temp_{get_uuid(f"AGPicCompress{time.time()}")}.webp'
-
-                                        ImageCompressor._save_image(None, temp_file_path, existing_bytes=compressed_img_bytes)
-
-                                        current_size = temp_file_path.stat().st_size / 1024
-
-                                        if current_size < min_size:
-                                            ImageCompressor._adjust_file_size(temp_file_path, min_size)
-                                            with open(temp_file_path, 'rb') as adjusted_file:
-                                                compressed_img_bytes = adjusted_file.read()
+                searching = target_size is not None or size_range is not None
+                pngquant_cmd = find_pngquant_cmd()
+                # Without pngquant, the size search can still fall back to the libimagequant binding
+                if not pngquant_cmd and not (searching and imagequant is not None):
+                    raise FileNotFoundError(
+                        'pngquant not found. Please ensure pngquant is installed or added to the environment variable')
+                # pngquant reads the PNG from stdin and writes the result to stdout, no temporary files are needed
+                if searching:
+                    compressed_img_bytes = ImageCompressor._converge_to_size(
+                        ImageCompressor._png_quantize_fn(pngquant_cmd, image_bytes, img), target_size, size_range,
+                        quality=ImageCompressor._search_quality(quality))
+                else:
+                    compressed_img_bytes = ImageCompressor._run_pngquant(pngquant_cmd, image_bytes, quality=quality)
+                if not compressed_img_bytes:
+                    warnings.warn(
+                        'The compressed image file was not generated successfully. It may no longer be compressible or no longer exist',
+                        Warning)
+                    return None
             else:
                 raise ValueError(f'"{output_format}": Unsupported output file format')
         return compressed_img_bytes
@@ -1031,10 +994,12 @@ class ImageCompressor:
     @click.option('--target-size', '-t', type=int, help='Target file size in KB. When specified, quality is ignored.')
     @click.option('--size-range', '-s', nargs=2, type=int,
                   help='Min and max size in KB. Tries to maintain quality while ensuring size is within range.')
-    @click.option('--webp-quality', '-wq', type=int, default=100,
-                  help='Quality for WebP conversion (1-100). Default is 100.')
+    @click.option('--webp-quality', '-wq', type=int, default=85,
+                  help='Quality for WebP conversion (1-100). Default is 85.')
+    @click.option('--jobs', '-j', type=click.IntRange(min=1),
+                  help='Number of images of a directory compressed in parallel. Defaults to the number of CPUs.')
     def cli_compress(fp, force=False, quality=None, output=None, webp=False, target_size=None, size_range=None,
-                     webp_quality=100):
+                     webp_quality=85, jobs=None):
         """
         Compress images via command line.
 
@@ -1059,24 +1024,29 @@ class ImageCompressor:
         :param size_range: Min and max size in KB. Tries to maintain quality while ensuring size is within range.
         :type size_range: tuple(int, int) or None
 
-        :param webp_quality: Quality for WebP conversion (1-100). Default is 100.
+        :param webp_quality: Quality for WebP conversion (1-100). Default is 85.
         :type webp_quality: int
+
+        :param jobs: Number of images of a directory compressed in parallel. Defaults to the number of CPUs.
+        :type jobs: int or None
         """
         if not fp:
             raise ValueError(f'"{fp}": The file path or directory cannot be empty')
 
         fp_path = Path(fp)
 
-        if output:
-            output_path = Path(output) if len(output) > 0 else None
-            
+        output_path = Path(output) if output else None
+
         size_range_tuple = tuple(size_range) if size_range else None
 
-        ImageCompressor.compress_image(fp_path, force, quality, output_path, webp, target_size, size_range_tuple, webp_quality)
+        ImageCompressor.compress_image(fp_path, force, quality, output_path, webp, target_size, size_range_tuple,
+                                       webp_quality, jobs)
         return
 
 
 if __name__ == "__main__":
+    # Required for the directory process pool in PyInstaller builds
+    multiprocessing.freeze_support()
     ImageCompressor.cli_compress()
 
     # Basic test cases
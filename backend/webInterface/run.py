@@ -39,7 +39,7 @@ class Run(tornado.web.RequestHandler):
 
             quality = int(self.get_argument('quality', default=80))
             webp = bool(self.get_argument('webp', default=''))
-            webp_quality = int(self.get_argument('webp_quality', default=100))
+            webp_quality = int(self.get_argument('webp_quality', default=85))
             
             target_size = self.get_argument('target_size', default=None)
             target_size = int(target_size) if target_size else None